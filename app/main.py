@@ -1,25 +1,31 @@
 from __future__ import annotations
 
 import asyncio
+import codecs
+import concurrent.futures
 import contextlib
 import csv
 import io
-import json
 import os
+import queue
 import re
 import sqlite3
 from contextlib import closing
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
-from typing import Any
+from typing import Any, AsyncIterator, Collection, Iterator
 
 import httpx
+import orjson
 import psycopg
-from psycopg.rows import dict_row
-from fastapi import FastAPI, HTTPException
+from psycopg.rows import dict_row, tuple_row
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi import Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field, field_validator
 
@@ -29,14 +35,20 @@ STATIC_DIR = BASE_DIR / "static"
 DEFAULT_SQLITE_URL = f"sqlite:///{DB_PATH}"
 DATABASE_URL = os.getenv("DATABASE_URL", DEFAULT_SQLITE_URL).strip()
 IS_POSTGRES = DATABASE_URL.startswith("postgres://") or DATABASE_URL.startswith("postgresql://")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").strip().upper()
+if SQLITE_SYNCHRONOUS not in {"OFF", "NORMAL", "FULL", "EXTRA"}:
+    SQLITE_SYNCHRONOUS = "NORMAL"
 
 DEFAULT_APIFY_ACTOR_ID = "apify/instagram-reel-scraper"
+APIFY_VIEWS_KEYS = ("videoPlayCount", "videoViewCount", "playCount")
+APIFY_LIKES_KEYS = ("likesCount", "likes")
 DAILY_RUN_HOUR = int(os.getenv("DAILY_RUN_HOUR", "9"))
 APIFY_MAX_CONCURRENT_RUNS = max(1, int(os.getenv("APIFY_MAX_CONCURRENT_RUNS", "1")))
 POLL_BATCH_SIZE = max(1, int(os.getenv("POLL_BATCH_SIZE", "5")))
 FETCH_RETRY_COUNT = max(1, int(os.getenv("FETCH_RETRY_COUNT", "2")))
 ENABLE_INTERNAL_SCHEDULER = os.getenv("ENABLE_INTERNAL_SCHEDULER", "1").strip() in {"1", "true", "yes"}
 CRON_SECRET = os.getenv("CRON_SECRET", "").strip()
+DB_POOL_SIZE = max(1, int(os.getenv("DB_POOL_SIZE", "4")))
 MANUAL_POLL_ENABLED = os.getenv("MANUAL_POLL_ENABLED", "1").strip() in {"1", "true", "yes"}
 INSTAGRAM_HEADERS = {
     "User-Agent": (
@@ -46,6 +58,127 @@ INSTAGRAM_HEADERS = {
     ),
     "Accept-Language": "en-US,en;q=0.9",
 }
+INSTAGRAM_RATE_LIMIT_TEXT = "Please wait a few minutes before you try again"
+HTML_FIRST_SCAN_BYTES = 64 * 1024
+HTML_MAX_BYTES = 2 * 1024 * 1024
+
+# All poll-result writes go through one thread so commits (and WAL checkpoints)
+# never block the event loop and never contend with each other.
+_DB_WRITER = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+
+_PROFILE_HANDLE_RE = re.compile(r"instagram\.com/([A-Za-z0-9._]+)/?$")
+_WHITESPACE_RE = re.compile(r"\s+")
+_SHORTCODE_RE = re.compile(r"instagram\.com/(?:reel|p)/([A-Za-z0-9_-]+)")
+_COMPACT_SCALE = {"k": 1_000, "m": 1_000_000, "b": 1_000_000_000}
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+# Each pattern is paired with a lowercase literal it cannot match without, so a
+# single html.lower() pass lets us skip regex scans for keys absent from the page.
+# The *_KEY_PATTERNS read exact JSON keys; the looser text patterns that follow
+# them in *_PATTERNS can match unrelated copy earlier on the page.
+_LIKES_KEY_PATTERNS: tuple[tuple[str | None, re.Pattern[str]], ...] = tuple(
+    (literal, re.compile(pattern, re.IGNORECASE))
+    for literal, pattern in (
+        ('"edge_media_preview_like"', r'"edge_media_preview_like"\s*:\s*\{\s*"count"\s*:\s*(\d+)'),
+        ('"like_count"', r'"like_count"\s*:\s*(\d+)'),
+        ('"likescount"', r'"likesCount"\s*:\s*(\d+)'),
+        ('"likes"', r'"likes"\s*:\s*\{\s*"count"\s*:\s*(\d+)'),
+    )
+)
+_LIKES_PATTERNS: tuple[tuple[str | None, re.Pattern[str]], ...] = _LIKES_KEY_PATTERNS + tuple(
+    (literal, re.compile(pattern, re.IGNORECASE))
+    for literal, pattern in (
+        ('content="', r'content="([\d,]+)\s+likes'),
+    )
+)
+_COMMENTS_KEY_PATTERNS: tuple[tuple[str | None, re.Pattern[str]], ...] = tuple(
+    (literal, re.compile(pattern, re.IGNORECASE))
+    for literal, pattern in (
+        ('"edge_media_to_comment"', r'"edge_media_to_comment"\s*:\s*\{\s*"count"\s*:\s*(\d+)'),
+        ('"comment_count"', r'"comment_count"\s*:\s*(\d+)'),
+        ('"commentscount"', r'"commentsCount"\s*:\s*(\d+)'),
+        ('"comments"', r'"comments"\s*:\s*\{\s*"count"\s*:\s*(\d+)'),
+    )
+)
+_COMMENTS_PATTERNS: tuple[tuple[str | None, re.Pattern[str]], ...] = _COMMENTS_KEY_PATTERNS + tuple(
+    (literal, re.compile(pattern, re.IGNORECASE))
+    for literal, pattern in (
+        ("likes,", r'likes,\s*([\d,]+)\s+comments'),
+        ("comments", r'([\d,]+)\s+comments'),
+    )
+)
+_VIEWS_KEY_PATTERNS: tuple[tuple[str | None, re.Pattern[str]], ...] = tuple(
+    (literal, re.compile(pattern, re.IGNORECASE))
+    for literal, pattern in (
+        ('"video_view_count"', r'"video_view_count"\s*:\s*(\d+)'),
+        ('"video_play_count"', r'"video_play_count"\s*:\s*(\d+)'),
+        ('"videoplaycount"', r'"videoPlayCount"\s*:\s*(\d+)'),
+        ('"play_count"', r'"play_count"\s*:\s*(\d+)'),
+        ('"videoviewcount"', r'"videoViewCount"\s*:\s*(\d+)'),
+    )
+)
+_VIEWS_PATTERNS: tuple[tuple[str | None, re.Pattern[str]], ...] = _VIEWS_KEY_PATTERNS + tuple(
+    (literal, re.compile(pattern, re.IGNORECASE))
+    for literal, pattern in (
+        (
+            '"watchaction"',
+            r'"interactionStatistic"\s*:\s*\[.*?"WatchAction".*?"userInteractionCount"\s*:\s*(\d+)',
+        ),
+    )
+)
+_LIKES_COMPACT_PATTERN: tuple[str | None, re.Pattern[str]] = (
+    "like",
+    re.compile(r'([0-9][0-9,\.]*\s*[kmb]?)\s+(?:likes|like)\b', re.IGNORECASE),
+)
+_COMMENTS_COMPACT_PATTERN: tuple[str | None, re.Pattern[str]] = (
+    "comment",
+    re.compile(r'([0-9][0-9,\.]*\s*[kmb]?)\s+(?:comments|comment)\b', re.IGNORECASE),
+)
+_VIEWS_COMPACT_PATTERN: tuple[str | None, re.Pattern[str]] = (
+    None,
+    re.compile(r'([0-9][0-9,\.]*\s*[kmb]?)\s+(?:views|view|plays|play)\b', re.IGNORECASE),
+)
+METRIC_KEYS = ("likes", "comments", "views")
+_METRIC_PATTERNS = {
+    "likes": (_LIKES_PATTERNS, _LIKES_COMPACT_PATTERN),
+    "comments": (_COMMENTS_PATTERNS, _COMMENTS_COMPACT_PATTERN),
+    "views": (_VIEWS_PATTERNS, _VIEWS_COMPACT_PATTERN),
+}
+_METRIC_KEY_PATTERNS = {
+    "likes": _LIKES_KEY_PATTERNS,
+    "comments": _COMMENTS_KEY_PATTERNS,
+    "views": _VIEWS_KEY_PATTERNS,
+}
+
+# Hot-path statements are kept as constants so every call sends identical SQL
+# text, which keeps them in sqlite3's statement cache and psycopg's prepared set.
+INSERT_SNAPSHOT_SQL = """
+    INSERT INTO snapshots(post_id, fetched_at, likes, comments, views, source_status, source_error)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+UPDATE_LAST_POLLED_SQL = "UPDATE posts SET last_polled_at = ? WHERE id = ?"
+UPSERT_CREATOR_SQL = """
+    INSERT INTO creators(handle, created_at, display_name, profile_url, followers_text)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(handle) DO UPDATE SET
+        display_name = COALESCE(excluded.display_name, creators.display_name),
+        profile_url = COALESCE(excluded.profile_url, creators.profile_url),
+        followers_text = COALESCE(excluded.followers_text, creators.followers_text)
+    RETURNING id
+"""
+INSERT_POST_IF_NEW_SQL = """
+    INSERT INTO posts(
+        campaign_id, creator_id, post_url, shortcode,
+        poll_interval_sec, active, created_at
+    ) VALUES (?, ?, ?, ?, ?, 1, ?)
+    ON CONFLICT(post_url) DO NOTHING
+    RETURNING id
+"""
+METRIC_SUMS_SQL = """
+    COUNT(*) AS posts,
+    COALESCE(SUM(s.views), 0) AS views,
+    COALESCE(SUM(s.likes), 0) AS likes,
+    COALESCE(SUM(s.comments), 0) AS comments
+"""
 
 
 class AddPostRequest(BaseModel):
@@ -79,6 +212,7 @@ def utc_now_iso() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
 
+@lru_cache(maxsize=4096)
 def normalize_instagram_url(url: str) -> str:
     normalized = url.strip()
     normalized = normalized.split("?")[0]
@@ -87,9 +221,10 @@ def normalize_instagram_url(url: str) -> str:
     return normalized
 
 
+@lru_cache(maxsize=4096)
 def parse_profile_handle(url: str) -> str | None:
     normalized = normalize_instagram_url(url)
-    match = re.search(r"instagram\.com/([A-Za-z0-9._]+)/?$", normalized)
+    match = _PROFILE_HANDLE_RE.search(normalized)
     if match:
         handle = match.group(1)
         if handle not in {"reel", "p", "tv"}:
@@ -97,21 +232,103 @@ def parse_profile_handle(url: str) -> str | None:
     return None
 
 
+_sqlite_wal_enabled = False
+_db_pool: queue.Queue[Any] = queue.Queue(maxsize=DB_POOL_SIZE)
+
+
 def get_db() -> sqlite3.Connection:
     if IS_POSTGRES:
         pg_url = DATABASE_URL.replace("postgres://", "postgresql://", 1)
         return psycopg.connect(pg_url, row_factory=dict_row)
-    conn = sqlite3.connect(DB_PATH)
+    global _sqlite_wal_enabled
+    # Autocommit mode: writes are grouped explicitly with db_transaction().
+    # Pooled connections may be handed to a different thread than the one that
+    # opened them; the pool gives each connection to one request at a time.
+    conn = sqlite3.connect(
+        DB_PATH,
+        isolation_level=None,
+        cached_statements=256,
+        check_same_thread=False,
+    )
     conn.row_factory = sqlite3.Row
+    # journal_mode is stored in the database file, so it only needs setting once
+    # per process; the remaining pragmas are per-connection.
+    if not _sqlite_wal_enabled:
+        conn.execute("PRAGMA journal_mode=WAL")
+        _sqlite_wal_enabled = True
+    conn.executescript(
+        f"""
+        PRAGMA synchronous={SQLITE_SYNCHRONOUS};
+        PRAGMA busy_timeout=5000;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+        PRAGMA cache_size=-65536;
+        """
+    )
     return conn
 
 
+@lru_cache(maxsize=256)
+def to_pg_query(query: str) -> str:
+    return query.replace("?", "%s")
+
+
+def release_db(conn: Any) -> None:
+    # Reset any open transaction before reuse; broken or surplus connections are closed.
+    try:
+        conn.rollback()
+        _db_pool.put_nowait(conn)
+    except Exception:  # noqa: BLE001
+        with contextlib.suppress(Exception):
+            conn.close()
+
+
+async def db_dep() -> AsyncIterator[Any]:
+    try:
+        conn = _db_pool.get_nowait()
+    except queue.Empty:
+        conn = get_db()
+    try:
+        yield conn
+    finally:
+        release_db(conn)
+
+
+@contextlib.contextmanager
+def db_transaction(conn: Any) -> Iterator[Any]:
+    # IMMEDIATE takes the write lock up front instead of upgrading mid-batch.
+    if not IS_POSTGRES:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def close_db_pool() -> None:
+    while True:
+        try:
+            _db_pool.get_nowait().close()
+        except queue.Empty:
+            return
+
+
 def db_execute(conn: Any, query: str, params: tuple[Any, ...] = ()) -> Any:
     if IS_POSTGRES:
-        return conn.execute(query.replace("?", "%s"), params)
+        return conn.execute(to_pg_query(query), params)
     return conn.execute(query, params)
 
 
+def db_executemany(conn: Any, query: str, params_seq: list[tuple[Any, ...]]) -> Any:
+    if IS_POSTGRES:
+        cur = conn.cursor()
+        cur.executemany(to_pg_query(query), params_seq)
+        return cur
+    return conn.executemany(query, params_seq)
+
+
 def db_fetchone(conn: Any, query: str, params: tuple[Any, ...] = ()) -> Any:
     return db_execute(conn, query, params).fetchone()
 
@@ -120,6 +337,22 @@ def db_fetchall(conn: Any, query: str, params: tuple[Any, ...] = ()) -> Any:
     return db_execute(conn, query, params).fetchall()
 
 
+def db_fetchall_tuples(conn: Any, query: str, params: tuple[Any, ...] = ()) -> list[tuple[Any, ...]]:
+    # Hot loops skip the Row/dict factories and read rows positionally.
+    if IS_POSTGRES:
+        cur = conn.cursor(row_factory=tuple_row)
+        cur.execute(to_pg_query(query), params)
+    else:
+        cur = conn.cursor()
+        cur.row_factory = None
+        cur.execute(query, params)
+    return cur.fetchall()
+
+
+def db_fetch_ints(conn: Any, query: str, params: tuple[Any, ...] = ()) -> list[int]:
+    return [int(value) for (value,) in db_fetchall_tuples(conn, query, params)]
+
+
 def is_unique_violation(exc: Exception) -> bool:
     if isinstance(exc, sqlite3.IntegrityError):
         return True
@@ -130,14 +363,54 @@ def is_unique_violation(exc: Exception) -> bool:
 def insert_scheduled_snapshot(conn: Any, post_id: int) -> None:
     db_execute(
         conn,
-        """
-        INSERT INTO snapshots(post_id, fetched_at, likes, comments, views, source_status, source_error)
-        VALUES (?, ?, NULL, NULL, NULL, 'scheduled', NULL)
-        """,
-        (post_id, utc_now_iso()),
+        INSERT_SNAPSHOT_SQL,
+        (post_id, utc_now_iso(), None, None, None, "scheduled", None),
     )
 
 
+def latest_snapshot_cte(post_filter: str) -> str:
+    # One row per matching post: its newest snapshot, plus the newest non-NULL
+    # value of each metric. Every lookup is a seek on idx_snapshots_post_latest.
+    return f"""
+    latest AS (
+        SELECT
+            p.id AS post_id,
+            p.post_url,
+            p.last_polled_at,
+            p.campaign_id,
+            p.creator_id,
+            COALESCE(
+                s.likes,
+                (SELECT s3.likes FROM snapshots s3 WHERE s3.post_id = p.id AND s3.likes IS NOT NULL ORDER BY s3.fetched_at DESC, s3.id DESC LIMIT 1)
+            ) AS likes,
+            COALESCE(
+                s.comments,
+                (SELECT s3.comments FROM snapshots s3 WHERE s3.post_id = p.id AND s3.comments IS NOT NULL ORDER BY s3.fetched_at DESC, s3.id DESC LIMIT 1)
+            ) AS comments,
+            COALESCE(
+                s.views,
+                (SELECT s3.views FROM snapshots s3 WHERE s3.post_id = p.id AND s3.views IS NOT NULL ORDER BY s3.fetched_at DESC, s3.id DESC LIMIT 1)
+            ) AS views,
+            s.source_status,
+            s.source_error,
+            s.fetched_at
+        FROM posts p
+        LEFT JOIN snapshots s ON s.id = (
+            SELECT s2.id
+            FROM snapshots s2
+            WHERE s2.post_id = p.id
+            ORDER BY s2.fetched_at DESC, s2.id DESC
+            LIMIT 1
+        )
+        WHERE {post_filter}
+    )
+    """
+
+
+def sum_metric_totals(groups: list[dict[str, Any]]) -> dict[str, int]:
+    return {key: sum(group[key] for group in groups) for key in ("views", "likes", "comments", "posts")}
+
+
 def init_db() -> None:
     with closing(get_db()) as conn:
         if IS_POSTGRES:
@@ -197,17 +470,20 @@ def init_db() -> None:
             )
             db_execute(
                 conn,
-                "CREATE INDEX IF NOT EXISTS idx_snapshots_post_time ON snapshots(post_id, fetched_at DESC)",
+                "CREATE INDEX IF NOT EXISTS idx_snapshots_post_latest ON snapshots(post_id, fetched_at DESC, id DESC)",
             )
+            db_execute(conn, "DROP INDEX IF EXISTS idx_snapshots_post_time")
             db_execute(
                 conn,
                 "CREATE INDEX IF NOT EXISTS idx_posts_active ON posts(active, last_polled_at)",
             )
+            db_execute(
+                conn,
+                "CREATE INDEX IF NOT EXISTS idx_posts_active_campaign ON posts(campaign_id, active)",
+            )
         else:
             conn.executescript(
                 """
-                PRAGMA journal_mode=WAL;
-
                 CREATE TABLE IF NOT EXISTS campaigns (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     name TEXT NOT NULL UNIQUE,
@@ -246,11 +522,16 @@ def init_db() -> None:
                     FOREIGN KEY (post_id) REFERENCES posts(id)
                 );
 
-                CREATE INDEX IF NOT EXISTS idx_snapshots_post_time
-                    ON snapshots(post_id, fetched_at DESC);
+                CREATE INDEX IF NOT EXISTS idx_snapshots_post_latest
+                    ON snapshots(post_id, fetched_at DESC, id DESC);
+
+                DROP INDEX IF EXISTS idx_snapshots_post_time;
 
                 CREATE INDEX IF NOT EXISTS idx_posts_active
                     ON posts(active, last_polled_at);
+
+                CREATE INDEX IF NOT EXISTS idx_posts_active_campaign
+                    ON posts(campaign_id, active);
                 """
             )
 
@@ -273,19 +554,15 @@ def init_db() -> None:
 
 
 def upsert_campaign(conn: sqlite3.Connection, name: str) -> int:
-    if IS_POSTGRES:
-        db_execute(
-            conn,
-            "INSERT INTO campaigns(name, created_at) VALUES (?, ?) ON CONFLICT(name) DO NOTHING",
-            (name.strip(), utc_now_iso()),
-        )
-    else:
-        db_execute(
-            conn,
-            "INSERT OR IGNORE INTO campaigns(name, created_at) VALUES (?, ?)",
-            (name.strip(), utc_now_iso()),
-        )
-    row = db_fetchone(conn, "SELECT id FROM campaigns WHERE name = ?", (name.strip(),))
+    row = db_fetchone(
+        conn,
+        """
+        INSERT INTO campaigns(name, created_at) VALUES (?, ?)
+        ON CONFLICT(name) DO UPDATE SET name = excluded.name
+        RETURNING id
+        """,
+        (name.strip(), utc_now_iso()),
+    )
     return int(row["id"])
 
 
@@ -297,17 +574,9 @@ def upsert_creator(
     followers_text: str | None = None,
 ) -> int:
     normalized = handle.strip().lstrip("@")
-    insert_stmt = """
-        INSERT INTO creators(handle, created_at, display_name, profile_url, followers_text)
-        VALUES (?, ?, ?, ?, ?)
-    """
-    if IS_POSTGRES:
-        insert_stmt += " ON CONFLICT(handle) DO NOTHING"
-    else:
-        insert_stmt = insert_stmt.replace("INSERT INTO", "INSERT OR IGNORE INTO", 1)
-    db_execute(
+    row = db_fetchone(
         conn,
-        insert_stmt,
+        UPSERT_CREATOR_SQL,
         (
             normalized,
             utc_now_iso(),
@@ -316,29 +585,12 @@ def upsert_creator(
             (followers_text or "").strip() or None,
         ),
     )
-    db_execute(
-        conn,
-        """
-        UPDATE creators
-        SET
-            display_name = COALESCE(NULLIF(?, ''), display_name),
-            profile_url = COALESCE(NULLIF(?, ''), profile_url),
-            followers_text = COALESCE(NULLIF(?, ''), followers_text)
-        WHERE handle = ?
-        """,
-        (
-            (display_name or "").strip(),
-            (profile_url or "").strip(),
-            (followers_text or "").strip(),
-            normalized,
-        ),
-    )
-    row = db_fetchone(conn, "SELECT id FROM creators WHERE handle = ?", (normalized,))
     return int(row["id"])
 
 
+@lru_cache(maxsize=4096)
 def parse_shortcode(url: str) -> str | None:
-    match = re.search(r"instagram\.com/(?:reel|p)/([A-Za-z0-9_-]+)", url)
+    match = _SHORTCODE_RE.search(url)
     if match:
         return match.group(1)
     return None
@@ -352,15 +604,34 @@ def coerce_int(value: Any) -> int | None:
     if isinstance(value, (int, float)):
         return int(value)
     if isinstance(value, str):
-        cleaned = value.strip().replace(",", "").lower()
-        compact_match = re.fullmatch(r"(\d+(?:\.\d+)?)([kmb])", cleaned)
-        if compact_match:
-            base = float(compact_match.group(1))
-            unit = compact_match.group(2)
-            mult = {"k": 1_000, "m": 1_000_000, "b": 1_000_000_000}[unit]
-            return int(base * mult)
-        if cleaned.isdigit():
-            return int(cleaned)
+        return parse_compact_number(value)
+    return None
+
+
+def parse_compact_number(text: str) -> int | None:
+    # Handles "1234", "1,234", "1.2k", "3M" without a regex or a lowercased copy.
+    cleaned = text.strip().replace(",", "")
+    if not cleaned:
+        return None
+    mult = _COMPACT_SCALE.get(cleaned[-1].lower())
+    if mult is None:
+        return int(cleaned) if cleaned.isdecimal() else None
+    # isdecimal() is exactly what int()/float() accept: "١٢" parses, "²" does not.
+    whole, dot, frac = cleaned[:-1].partition(".")
+    if not whole.isdecimal():
+        return None
+    if not dot:
+        return int(whole) * mult
+    if not frac.isdecimal():
+        return None
+    return int(float(f"{whole}.{frac}") * mult)
+
+
+def first_int(item: dict[str, Any], keys: tuple[str, ...]) -> int | None:
+    for key in keys:
+        value = coerce_int(item.get(key))
+        if value is not None:
+            return value
     return None
 
 
@@ -374,9 +645,15 @@ def resolve_comments(item: dict[str, Any]) -> int | None:
     return coerce_int(comments_raw)
 
 
-def extract_first_int(html: str, patterns: list[str]) -> int | None:
-    for pattern in patterns:
-        match = re.search(pattern, html, flags=re.IGNORECASE)
+def extract_first_int(
+    html: str,
+    lowered: str,
+    patterns: tuple[tuple[str | None, re.Pattern[str]], ...],
+) -> int | None:
+    for literal, pattern in patterns:
+        if literal is not None and literal not in lowered:
+            continue
+        match = pattern.search(html)
         if match:
             coerced = coerce_int(match.group(1))
             if coerced is not None:
@@ -384,27 +661,53 @@ def extract_first_int(html: str, patterns: list[str]) -> int | None:
     return None
 
 
-def extract_first_compact_number(html: str, pattern: str) -> int | None:
-    match = re.search(pattern, html, flags=re.IGNORECASE)
+def extract_first_compact_number(
+    html: str,
+    lowered: str,
+    guarded_pattern: tuple[str | None, re.Pattern[str]],
+) -> int | None:
+    literal, pattern = guarded_pattern
+    if literal is not None and literal not in lowered:
+        return None
+    match = pattern.search(html)
     if not match:
         return None
     return coerce_int(match.group(1))
 
 
-def extract_json_ld_metrics(html: str) -> dict[str, int | None]:
+def iter_json_ld_blocks(html: str, lowered: str) -> Iterator[str]:
+    # Tags are matched case-insensitively in `lowered`, and blocks are sliced from
+    # `html`. str.lower() can lengthen the text (e.g. "İ"), which would shift the
+    # offsets; in that case fall back to ASCII-only folding.
+    if len(lowered) != len(html):
+        lowered = html.translate(_ASCII_LOWER)
+    pos = 0
+    while True:
+        start = lowered.find("<script", pos)
+        if start == -1:
+            return
+        tag_end = lowered.find(">", start)
+        if tag_end == -1:
+            return
+        end = lowered.find("</script>", tag_end)
+        if end == -1:
+            return
+        pos = end + len("</script>")
+        if 'type="application/ld+json"' in lowered[start:tag_end]:
+            yield html[tag_end + 1 : end]
+
+
+def extract_json_ld_metrics(html: str, lowered: str) -> dict[str, int | None]:
     likes: int | None = None
     comments: int | None = None
     views: int | None = None
-    for block in re.findall(
-        r'<script[^>]*type="application/ld\+json"[^>]*>(.*?)</script>',
-        html,
-        flags=re.IGNORECASE | re.DOTALL,
-    ):
-        raw = block.strip()
-        if not raw:
+    for block in iter_json_ld_blocks(html, lowered):
+        # Only blocks carrying interaction stats can contribute metrics.
+        if '"interactionStatistic"' not in block:
             continue
+        raw = block.strip()
         try:
-            data = json.loads(raw)
+            data = orjson.loads(raw)
         except Exception:
             continue
         if not isinstance(data, dict):
@@ -433,119 +736,154 @@ def extract_json_ld_metrics(html: str) -> dict[str, int | None]:
     return {"likes": likes, "comments": comments, "views": views}
 
 
-def extract_metrics_from_html(html: str) -> dict[str, int | None]:
-    likes = extract_first_int(
-        html,
-        [
-            r'"edge_media_preview_like"\s*:\s*\{\s*"count"\s*:\s*(\d+)',
-            r'"like_count"\s*:\s*(\d+)',
-            r'"likesCount"\s*:\s*(\d+)',
-            r'"likes"\s*:\s*\{\s*"count"\s*:\s*(\d+)',
-            r'content="([\d,]+)\s+likes',
-        ],
-    )
-    comments = extract_first_int(
-        html,
-        [
-            r'"edge_media_to_comment"\s*:\s*\{\s*"count"\s*:\s*(\d+)',
-            r'"comment_count"\s*:\s*(\d+)',
-            r'"commentsCount"\s*:\s*(\d+)',
-            r'"comments"\s*:\s*\{\s*"count"\s*:\s*(\d+)',
-            r'likes,\s*([\d,]+)\s+comments',
-            r'([\d,]+)\s+comments',
-        ],
-    )
-    views = extract_first_int(
-        html,
-        [
-            r'"video_view_count"\s*:\s*(\d+)',
-            r'"video_play_count"\s*:\s*(\d+)',
-            r'"videoPlayCount"\s*:\s*(\d+)',
-            r'"play_count"\s*:\s*(\d+)',
-            r'"videoViewCount"\s*:\s*(\d+)',
-            r'"interactionStatistic"\s*:\s*\[.*?"WatchAction".*?"userInteractionCount"\s*:\s*(\d+)',
-        ],
-    )
-    if likes is None:
-        likes = extract_first_compact_number(
-            html,
-            r'([0-9][0-9,\.]*\s*[kmb]?)\s+(?:likes|like)\b',
-        )
-    if comments is None:
-        comments = extract_first_compact_number(
-            html,
-            r'([0-9][0-9,\.]*\s*[kmb]?)\s+(?:comments|comment)\b',
-        )
-    if views is None:
-        views = extract_first_compact_number(
-            html,
-            r'([0-9][0-9,\.]*\s*[kmb]?)\s+(?:views|view|plays|play)\b',
-        )
-
-    json_ld = extract_json_ld_metrics(html)
-    if likes is None:
-        likes = json_ld["likes"]
-    if comments is None:
-        comments = json_ld["comments"]
-    if views is None:
-        views = json_ld["views"]
+def extract_metrics_from_html(
+    html: str,
+    missing: Collection[str] = METRIC_KEYS,
+    keys_only: bool = False,
+) -> dict[str, int | None]:
+    # Only keys in `missing` are searched for; the rest come back as None.
+    # keys_only restricts the search to exact JSON keys, for partial pages where
+    # a loose text match could shadow the real value further down.
+    lowered = html.lower()
+    metrics: dict[str, int | None] = dict.fromkeys(METRIC_KEYS)
+    if keys_only:
+        for key in missing:
+            metrics[key] = extract_first_int(html, lowered, _METRIC_KEY_PATTERNS[key])
+        return metrics
+    for key in missing:
+        patterns, compact_pattern = _METRIC_PATTERNS[key]
+        value = extract_first_int(html, lowered, patterns)
+        if value is None:
+            value = extract_first_compact_number(html, lowered, compact_pattern)
+        metrics[key] = value
+
+    if any(metrics[key] is None for key in missing):
+        json_ld = extract_json_ld_metrics(html, lowered)
+        for key in missing:
+            if metrics[key] is None:
+                metrics[key] = json_ld[key]
 
-    return {"likes": likes, "comments": comments, "views": views}
+    return metrics
 
 
 def find_first_key_int(data: Any, keys: tuple[str, ...]) -> int | None:
-    if isinstance(data, dict):
-        for key in keys:
-            if key in data:
-                parsed = coerce_int(data.get(key))
-                if parsed is not None:
-                    return parsed
-        for value in data.values():
-            found = find_first_key_int(value, keys)
-            if found is not None:
-                return found
-    elif isinstance(data, list):
-        for item in data:
-            found = find_first_key_int(item, keys)
-            if found is not None:
-                return found
+    # Depth-first, in document order, without recursion; scalars are never pushed.
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key in keys:
+                if key in node:
+                    parsed = coerce_int(node[key])
+                    if parsed is not None:
+                        return parsed
+            children = node.values()
+        elif isinstance(node, list):
+            children = node
+        else:
+            continue
+        stack.extend(child for child in reversed(children) if isinstance(child, (dict, list)))
     return None
 
 
+def build_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=30.0,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=max(100, APIFY_MAX_CONCURRENT_RUNS),
+            max_keepalive_connections=max(20, APIFY_MAX_CONCURRENT_RUNS),
+        ),
+        http2=True,
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    client = getattr(app.state, "http", None)
+    if client is None or client.is_closed:
+        client = build_http_client()
+        app.state.http = client
+    return client
+
+
+async def stream_html_metrics(client: httpx.AsyncClient, url: str) -> tuple[int, dict[str, int | None]]:
+    # Metrics usually sit in the first few KB of the page, so parse as chunks
+    # arrive and stop downloading once all three are found. Scan points double
+    # so a page without metrics is rescanned O(log n) times, not once per step.
+    async with client.stream("GET", url, headers=INSTAGRAM_HEADERS) as response:
+        if response.status_code >= 400:
+            return response.status_code, dict.fromkeys(METRIC_KEYS)
+        decoder = codecs.getincrementaldecoder("utf-8")("ignore")
+        parts: list[str] = []
+        received = 0
+        metrics: dict[str, int | None] = dict.fromkeys(METRIC_KEYS)
+        missing = set(METRIC_KEYS)
+        next_scan = HTML_FIRST_SCAN_BYTES
+        async for chunk in response.aiter_bytes():
+            parts.append(decoder.decode(chunk))
+            received += len(chunk)
+            if received < next_scan:
+                continue
+            html = "".join(parts)
+            parts = [html]
+            # Stop at the last tag or line end so a number split across chunks
+            # is never read short.
+            safe_end = max(html.rfind(">"), html.rfind("\n")) + 1
+            html = html[:safe_end]
+            if INSTAGRAM_RATE_LIMIT_TEXT in html:
+                raise RuntimeError("Instagram rate-limited internal scraper request")
+            # Loose text and JSON-LD fallbacks wait for the whole page (or the
+            # size cap), so an early "2 likes" cannot beat a later JSON key.
+            capped = received >= HTML_MAX_BYTES
+            found = extract_metrics_from_html(html, missing, keys_only=not capped)
+            for key in list(missing):
+                if found[key] is not None:
+                    metrics[key] = found[key]
+                    missing.discard(key)
+            if not missing or capped:
+                return response.status_code, metrics
+            next_scan = min(received * 2, HTML_MAX_BYTES)
+
+    html = "".join(parts) + decoder.decode(b"", final=True)
+    if INSTAGRAM_RATE_LIMIT_TEXT in html:
+        raise RuntimeError("Instagram rate-limited internal scraper request")
+    found = extract_metrics_from_html(html, missing)
+    for key in missing:
+        metrics[key] = found[key]
+    return response.status_code, metrics
+
+
 async def fetch_metrics_from_internal(url: str) -> dict[str, Any]:
     normalized = normalize_instagram_url(url)
-    async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-        response = await client.get(normalized, headers=INSTAGRAM_HEADERS)
-        if response.status_code >= 400:
-            raise RuntimeError(f"Internal scraper request failed: HTTP {response.status_code}")
-        if "Please wait a few minutes before you try again" in response.text:
-            raise RuntimeError("Instagram rate-limited internal scraper request")
-        metrics = extract_metrics_from_html(response.text)
-
-        # Fallback to Instagram JSON payload for public posts when available.
-        if all(metrics[key] is None for key in ("likes", "comments", "views")):
-            json_url = f"{normalized}/?__a=1&__d=dis"
-            json_resp = await client.get(json_url, headers=INSTAGRAM_HEADERS)
-            if json_resp.status_code < 400:
-                try:
-                    data = json_resp.json()
-                    metrics = {
-                        "likes": find_first_key_int(data, ("like_count", "likes_count", "likesCount")),
-                        "comments": find_first_key_int(data, ("comment_count", "comments_count", "commentsCount")),
-                        "views": find_first_key_int(
-                            data,
-                            ("play_count", "video_view_count", "video_play_count", "videoPlayCount", "videoViewCount"),
-                        ),
-                    }
-                except Exception:
-                    pass
-
-        if all(metrics[key] is None for key in ("likes", "comments", "views")):
-            embed_url = f"{normalized}/embed/captioned"
-            embed_response = await client.get(embed_url, headers=INSTAGRAM_HEADERS)
-            if embed_response.status_code < 400:
-                metrics = extract_metrics_from_html(embed_response.text)
-    if all(metrics[key] is None for key in ("likes", "comments", "views")):
+    client = get_http_client()
+    status_code, metrics = await stream_html_metrics(client, normalized)
+    if status_code >= 400:
+        raise RuntimeError(f"Internal scraper request failed: HTTP {status_code}")
+
+    # Fallback to Instagram JSON payload for public posts when available.
+    if all(metrics[key] is None for key in METRIC_KEYS):
+        json_url = f"{normalized}/?__a=1&__d=dis"
+        json_resp = await client.get(json_url, headers=INSTAGRAM_HEADERS)
+        if json_resp.status_code < 400:
+            try:
+                data = orjson.loads(json_resp.content)
+                metrics = {
+                    "likes": find_first_key_int(data, ("like_count", "likes_count", "likesCount")),
+                    "comments": find_first_key_int(data, ("comment_count", "comments_count", "commentsCount")),
+                    "views": find_first_key_int(
+                        data,
+                        ("play_count", "video_view_count", "video_play_count", "videoPlayCount", "videoViewCount"),
+                    ),
+                }
+            except Exception:
+                pass
+
+    if all(metrics[key] is None for key in METRIC_KEYS):
+        embed_url = f"{normalized}/embed/captioned"
+        embed_status, embed_metrics = await stream_html_metrics(client, embed_url)
+        if embed_status < 400:
+            metrics = embed_metrics
+    if all(metrics[key] is None for key in METRIC_KEYS):
         raise RuntimeError("Internal scraper could not parse views/likes/comments")
     return metrics
 
@@ -560,25 +898,22 @@ async def fetch_metrics_from_apify(url: str) -> dict[str, Any]:
     endpoint = f"https://api.apify.com/v2/acts/{actor_path}/run-sync-get-dataset-items"
     payload = {"username": [url]}
 
-    async with httpx.AsyncClient(timeout=120.0, follow_redirects=True) as client:
-        response = await client.post(endpoint, params={"token": token}, json=payload)
+    response = await get_http_client().post(endpoint, params={"token": token}, json=payload, timeout=120.0)
 
     if response.status_code >= 400:
         raise RuntimeError(f"Apify actor call failed: HTTP {response.status_code} {response.text[:300]}")
 
-    items = response.json()
+    items = orjson.loads(response.content)
     if not isinstance(items, list) or not items:
         raise RuntimeError("Apify actor returned no items")
 
     item = items[0] if isinstance(items[0], dict) else {}
     metrics = {
-        "views": coerce_int(item.get("videoPlayCount"))
-        or coerce_int(item.get("videoViewCount"))
-        or coerce_int(item.get("playCount")),
-        "likes": coerce_int(item.get("likesCount")) or coerce_int(item.get("likes")),
+        "views": first_int(item, APIFY_VIEWS_KEYS),
+        "likes": first_int(item, APIFY_LIKES_KEYS),
         "comments": resolve_comments(item),
     }
-    if all(metrics[key] is None for key in ("likes", "comments", "views")):
+    if all(metrics[key] is None for key in METRIC_KEYS):
         raise RuntimeError("Apify response missing views/likes/comments fields")
 
     return metrics
@@ -598,7 +933,7 @@ async def fetch_instagram_metrics(url: str) -> dict[str, Any]:
     raise RuntimeError(" | ".join(errors[:4]))
 
 
-async def poll_post(post_id: int) -> None:
+async def poll_post(post_id: int) -> tuple[Any, ...] | None:
     with closing(get_db()) as conn:
         post = db_fetchone(
             conn,
@@ -611,7 +946,7 @@ async def poll_post(post_id: int) -> None:
         )
 
     if not post:
-        return
+        return None
 
     now = utc_now_iso()
     status = "ok"
@@ -630,53 +965,43 @@ async def poll_post(post_id: int) -> None:
         status = "error"
         error = str(exc)
 
-    with closing(get_db()) as conn:
-        db_execute(
-            conn,
-            """
-            INSERT INTO snapshots(post_id, fetched_at, likes, comments, views, source_status, source_error)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
-            (post_id, now, likes, comments, views, status, error),
-        )
-        db_execute(
-            conn,
-            "UPDATE posts SET last_polled_at = ? WHERE id = ?",
-            (now, post_id),
-        )
-        conn.commit()
+    return (post_id, now, likes, comments, views, status, error)
+
+
+def save_poll_results(results: list[tuple[Any, ...]]) -> None:
+    if not results:
+        return
+    with closing(get_db()) as conn, db_transaction(conn):
+        db_executemany(conn, INSERT_SNAPSHOT_SQL, results)
+        db_executemany(conn, UPDATE_LAST_POLLED_SQL, [(row[1], row[0]) for row in results])
 
 
 async def poll_due_posts() -> int:
-    with closing(get_db()) as conn:
-        rows = db_fetchall(
-            conn,
-            """
-            SELECT id, last_polled_at, poll_interval_sec
+    if IS_POSTGRES:
+        due_sql = """
+            SELECT id
             FROM posts
             WHERE active = 1
-            """
-        )
-
-    if not rows:
-        return 0
-
-    due_post_ids: list[int] = []
-    now = datetime.now(timezone.utc)
-    for row in rows:
-        last_polled_raw = row["last_polled_at"]
-        interval = int(row["poll_interval_sec"] or 300)
-        if not last_polled_raw:
-            due_post_ids.append(int(row["id"]))
-            continue
-        try:
-            last_polled = datetime.fromisoformat(last_polled_raw)
-            if last_polled.tzinfo is None:
-                last_polled = last_polled.replace(tzinfo=timezone.utc)
-            if now >= last_polled + timedelta(seconds=interval):
-                due_post_ids.append(int(row["id"]))
-        except Exception:
-            due_post_ids.append(int(row["id"]))
+              AND (
+                  last_polled_at IS NULL
+                  OR last_polled_at::timestamptz
+                      + make_interval(secs => COALESCE(NULLIF(poll_interval_sec, 0), 300)) <= now()
+              )
+        """
+    else:
+        due_sql = """
+            SELECT id
+            FROM posts
+            WHERE active = 1
+              AND (
+                  last_polled_at IS NULL
+                  OR julianday(last_polled_at) IS NULL
+                  OR julianday('now') - julianday(last_polled_at)
+                      >= COALESCE(NULLIF(poll_interval_sec, 0), 300) / 86400.0
+              )
+        """
+    with closing(get_db()) as conn:
+        due_post_ids = db_fetch_ints(conn, due_sql)
 
     if not due_post_ids:
         return 0
@@ -686,7 +1011,7 @@ async def poll_due_posts() -> int:
 
 async def poll_all_active_posts() -> int:
     with closing(get_db()) as conn:
-        post_ids = [int(row["id"]) for row in db_fetchall(conn, "SELECT id FROM posts WHERE active = 1")]
+        post_ids = db_fetch_ints(conn, "SELECT id FROM posts WHERE active = 1")
     if not post_ids:
         return 0
     await poll_post_ids(post_ids)
@@ -697,20 +1022,39 @@ async def poll_post_ids(post_ids: list[int]) -> None:
     if not post_ids:
         return
 
-    concurrent_per_batch = min(APIFY_MAX_CONCURRENT_RUNS, POLL_BATCH_SIZE)
-    for start in range(0, len(post_ids), POLL_BATCH_SIZE):
-        chunk = post_ids[start : start + POLL_BATCH_SIZE]
-        if concurrent_per_batch >= len(chunk):
-            await asyncio.gather(*(poll_post(post_id) for post_id in chunk))
-            continue
+    semaphore = asyncio.Semaphore(min(APIFY_MAX_CONCURRENT_RUNS, POLL_BATCH_SIZE))
 
-        semaphore = asyncio.Semaphore(concurrent_per_batch)
+    async def worker(post_id: int) -> tuple[Any, ...] | None:
+        async with semaphore:
+            return await poll_post(post_id)
 
-        async def worker(post_id: int) -> None:
-            async with semaphore:
-                await poll_post(post_id)
+    async def flush(rows: list[tuple[Any, ...]]) -> None:
+        # Shielded so a cancelled cycle still writes what it already fetched.
+        loop = asyncio.get_running_loop()
+        await asyncio.shield(loop.run_in_executor(_DB_WRITER, save_poll_results, rows))
 
-        await asyncio.gather(*(worker(post_id) for post_id in chunk))
+    # Results are written every POLL_BATCH_SIZE posts so long cycles show
+    # progress and a cancelled cycle loses nothing already fetched.
+    tasks = [asyncio.ensure_future(worker(post_id)) for post_id in post_ids]
+    rows: list[tuple[Any, ...]] = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                row = await next_done
+            except Exception:  # noqa: BLE001
+                # One failing post must not discard the results gathered for the rest.
+                continue
+            if row is None:
+                continue
+            rows.append(row)
+            if len(rows) >= POLL_BATCH_SIZE:
+                batch, rows = rows, []
+                await flush(batch)
+    finally:
+        for task in tasks:
+            task.cancel()
+        if rows:
+            await flush(rows)
 
 
 def seconds_until_next_daily_run(hour: int) -> float:
@@ -731,7 +1075,11 @@ async def polling_loop() -> None:
             pass
 
 
-app = FastAPI(title="Instagram Reel Campaign Tracker", version="0.1.0")
+app = FastAPI(
+    title="Instagram Reel Campaign Tracker",
+    version="0.1.0",
+    default_response_class=ORJSONResponse,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -746,6 +1094,7 @@ app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 @app.on_event("startup")
 async def startup_event() -> None:
     init_db()
+    app.state.http = build_http_client()
     app.state.poll_task = None
     if ENABLE_INTERNAL_SCHEDULER:
         app.state.poll_task = asyncio.create_task(polling_loop())
@@ -758,6 +1107,10 @@ async def shutdown_event() -> None:
         poll_task.cancel()
         with contextlib.suppress(asyncio.CancelledError):
             await poll_task
+    http_client = getattr(app.state, "http", None)
+    if http_client:
+        await http_client.aclose()
+    close_db_pool()
 
 
 @app.get("/api/health")
@@ -787,19 +1140,20 @@ async def campaign_view(campaign_id: int) -> FileResponse:
 
 @app.post("/api/posts")
 async def add_post(payload: AddPostRequest) -> dict[str, Any]:
-    with closing(get_db()) as conn:
+    with closing(get_db()) as conn, db_transaction(conn):
         campaign_id = upsert_campaign(conn, payload.campaign_name)
         creator_id = upsert_creator(conn, payload.creator_handle)
         shortcode = parse_shortcode(payload.post_url)
 
         try:
-            cur = db_execute(
+            post_row = db_fetchone(
                 conn,
                 """
                 INSERT INTO posts(
                     campaign_id, creator_id, post_url, shortcode,
                     poll_interval_sec, active, created_at
                 ) VALUES (?, ?, ?, ?, ?, 1, ?)
+                RETURNING id
                 """,
                 (
                     campaign_id,
@@ -810,7 +1164,6 @@ async def add_post(payload: AddPostRequest) -> dict[str, Any]:
                     utc_now_iso(),
                 ),
             )
-            post_row = db_fetchone(conn, "SELECT id FROM posts WHERE post_url = ?", (payload.post_url,))
             post_id = int(post_row["id"])
             insert_scheduled_snapshot(conn, post_id)
         except Exception as exc:
@@ -818,49 +1171,49 @@ async def add_post(payload: AddPostRequest) -> dict[str, Any]:
                 raise
             raise HTTPException(status_code=409, detail="Post URL already exists") from exc
 
-        conn.commit()
-
     return {"ok": True, "post_id": post_id}
 
 
 @app.post("/api/posts/bulk")
 async def bulk_add_posts(payload: BulkAddRequest) -> dict[str, Any]:
-    raw_rows = list(
-        csv.DictReader(
-            io.StringIO(payload.bulk_text.strip()),
-            delimiter="\t",
-        )
+    reader = csv.DictReader(
+        io.StringIO(payload.bulk_text.strip()),
+        delimiter="\t",
     )
+    raw_rows = list(reader)
     if not raw_rows:
         raise HTTPException(status_code=400, detail="No rows found in bulk text")
 
     def norm_header(key: str) -> str:
         return key.replace("\ufeff", "").strip().lower()
 
-    def row_value(row: dict[str, Any], key: str) -> str:
-        for raw_key, raw_value in row.items():
-            if norm_header(raw_key) == key:
-                return str(raw_value or "")
-        return ""
+    header_map: dict[str, str] = {}
+    for raw_key in reader.fieldnames or []:
+        header_map.setdefault(norm_header(raw_key), raw_key)
 
     required_columns = {"name", "profile link", "followers", "live link"}
-    incoming_columns = {norm_header(k) for k in raw_rows[0].keys()}
-    if not required_columns.issubset(incoming_columns):
+    if not required_columns.issubset(header_map):
         raise HTTPException(
             status_code=400,
             detail="Bulk format must include: Name, Profile Link, Followers, Live Link",
         )
 
+    rows = [
+        {key: str(raw_row.get(raw_key) or "") for key, raw_key in header_map.items()}
+        for raw_row in raw_rows
+    ]
+
     inserted_post_ids: list[int] = []
     errors: list[dict[str, Any]] = []
 
-    with closing(get_db()) as conn:
+    with closing(get_db()) as conn, db_transaction(conn):
         campaign_id = upsert_campaign(conn, payload.campaign_name)
-        for idx, row in enumerate(raw_rows, start=2):
-            name = row_value(row, "name").strip()
-            profile_link = row_value(row, "profile link").strip()
-            followers = row_value(row, "followers").strip()
-            live_link = row_value(row, "live link").strip()
+        creator_ids: dict[tuple[str, str | None, str | None, str | None], int] = {}
+        for idx, row in enumerate(rows, start=2):
+            name = row["name"].strip()
+            profile_link = row["profile link"].strip()
+            followers = row["followers"].strip()
+            live_link = row["live link"].strip()
             if not live_link:
                 errors.append({"line": idx, "reason": "Missing Live Link"})
                 continue
@@ -870,45 +1223,52 @@ async def bulk_add_posts(payload: BulkAddRequest) -> dict[str, Any]:
                 errors.append({"line": idx, "reason": "Live Link is not /reel/ or /p/ URL"})
                 continue
 
-            creator_handle = parse_profile_handle(profile_link) or re.sub(r"\s+", "_", name.lower()).strip("_")
+            creator_handle = parse_profile_handle(profile_link) or _WHITESPACE_RE.sub("_", name.lower()).strip("_")
             if not creator_handle:
                 errors.append({"line": idx, "reason": "Could not resolve creator handle"})
                 continue
 
-            creator_id = upsert_creator(
-                conn,
+            # Campaign sheets repeat creators; identical rows need only one upsert.
+            creator_key = (
                 creator_handle,
-                display_name=name or None,
-                profile_url=normalize_instagram_url(profile_link) if profile_link else None,
-                followers_text=followers or None,
+                name or None,
+                normalize_instagram_url(profile_link) if profile_link else None,
+                followers or None,
             )
-            try:
-                db_execute(
+            creator_id = creator_ids.get(creator_key)
+            if creator_id is None:
+                creator_id = upsert_creator(
                     conn,
-                    """
-                    INSERT INTO posts(
-                        campaign_id, creator_id, post_url, shortcode,
-                        poll_interval_sec, active, created_at
-                    ) VALUES (?, ?, ?, ?, ?, 1, ?)
-                    """,
-                    (
-                        campaign_id,
-                        creator_id,
-                        post_url,
-                        shortcode,
-                        86400,
-                        utc_now_iso(),
-                    ),
+                    creator_handle,
+                    display_name=creator_key[1],
+                    profile_url=creator_key[2],
+                    followers_text=creator_key[3],
                 )
-                inserted_row = db_fetchone(conn, "SELECT id FROM posts WHERE post_url = ?", (post_url,))
-                inserted_post_ids.append(int(inserted_row["id"]))
-                insert_scheduled_snapshot(conn, int(inserted_row["id"]))
-            except Exception as exc:
-                if not is_unique_violation(exc):
-                    raise
+                creator_ids[creator_key] = creator_id
+            inserted_row = db_fetchone(
+                conn,
+                INSERT_POST_IF_NEW_SQL,
+                (
+                    campaign_id,
+                    creator_id,
+                    post_url,
+                    shortcode,
+                    86400,
+                    utc_now_iso(),
+                ),
+            )
+            if inserted_row is None:
                 errors.append({"line": idx, "reason": "Duplicate post URL"})
+                continue
+            inserted_post_ids.append(int(inserted_row["id"]))
 
-        conn.commit()
+        if inserted_post_ids:
+            scheduled_at = utc_now_iso()
+            db_executemany(
+                conn,
+                INSERT_SNAPSHOT_SQL,
+                [(post_id, scheduled_at, None, None, None, "scheduled", None) for post_id in inserted_post_ids],
+            )
 
     # Bulk flow: fetch once immediately so first metrics are available,
     # then continue with daily 9 AM updates afterward.
@@ -929,37 +1289,32 @@ async def poll_now(payload: PollRequest) -> dict[str, Any]:
         raise HTTPException(status_code=403, detail="Manual polling is disabled. Updates run daily at 9:00 AM.")
 
     if payload.post_id is not None:
-        await poll_post(payload.post_id)
+        await poll_post_ids([payload.post_id])
         return {"ok": True, "polled": 1}
 
     with closing(get_db()) as conn:
-        post_ids = [int(row["id"]) for row in db_fetchall(conn, "SELECT id FROM posts WHERE active = 1")]
+        post_ids = db_fetch_ints(conn, "SELECT id FROM posts WHERE active = 1")
 
     await poll_post_ids(post_ids)
     return {"ok": True, "polled": len(post_ids)}
 
 
 @app.delete("/api/creators/{creator_id}")
-async def delete_creator(creator_id: int) -> dict[str, Any]:
-    with closing(get_db()) as conn:
-        creator_row = db_fetchone(
+async def delete_creator(creator_id: int, conn: Any = Depends(db_dep)) -> dict[str, Any]:
+    creator_row = db_fetchone(
+        conn,
+        "SELECT id, handle FROM creators WHERE id = ?",
+        (creator_id,),
+    )
+    if not creator_row:
+        raise HTTPException(status_code=404, detail="Creator not found")
+
+    with db_transaction(conn):
+        deleted_snapshots = db_execute(
             conn,
-            "SELECT id, handle FROM creators WHERE id = ?",
+            "DELETE FROM snapshots WHERE post_id IN (SELECT id FROM posts WHERE creator_id = ?)",
             (creator_id,),
-        )
-        if not creator_row:
-            raise HTTPException(status_code=404, detail="Creator not found")
-
-        post_ids = [int(row["id"]) for row in db_fetchall(conn, "SELECT id FROM posts WHERE creator_id = ?", (creator_id,))]
-
-        deleted_snapshots = 0
-        if post_ids:
-            placeholders = ",".join("?" for _ in post_ids)
-            deleted_snapshots = db_execute(
-                conn,
-                f"DELETE FROM snapshots WHERE post_id IN ({placeholders})",
-                post_ids,
-            ).rowcount
+        ).rowcount
 
         deleted_posts = db_execute(
             conn,
@@ -967,7 +1322,6 @@ async def delete_creator(creator_id: int) -> dict[str, Any]:
             (creator_id,),
         ).rowcount
         db_execute(conn, "DELETE FROM creators WHERE id = ?", (creator_id,))
-        conn.commit()
 
     return {
         "ok": True,
@@ -979,13 +1333,12 @@ async def delete_creator(creator_id: int) -> dict[str, Any]:
 
 
 @app.delete("/api/all-data")
-async def delete_all_data() -> dict[str, Any]:
-    with closing(get_db()) as conn:
+async def delete_all_data(conn: Any = Depends(db_dep)) -> dict[str, Any]:
+    with db_transaction(conn):
         deleted_snapshots = db_execute(conn, "DELETE FROM snapshots").rowcount
         deleted_posts = db_execute(conn, "DELETE FROM posts").rowcount
         deleted_creators = db_execute(conn, "DELETE FROM creators").rowcount
         deleted_campaigns = db_execute(conn, "DELETE FROM campaigns").rowcount
-        conn.commit()
 
     return {
         "ok": True,
@@ -997,236 +1350,250 @@ async def delete_all_data() -> dict[str, Any]:
 
 
 @app.get("/api/dashboard")
-async def dashboard() -> dict[str, Any]:
-    with closing(get_db()) as conn:
-        post_rows = db_fetchall(
-            conn,
-            """
-            SELECT
-                p.id AS post_id,
-                p.post_url,
-                p.poll_interval_sec,
-                p.last_polled_at,
-                c.id AS campaign_id,
-                c.name AS campaign_name,
-                cr.id AS creator_id,
-                cr.handle AS creator_handle,
-                cr.display_name AS creator_name,
-                cr.followers_text AS followers_text,
-                COALESCE(
-                    s.likes,
-                    (SELECT s3.likes FROM snapshots s3 WHERE s3.post_id = p.id AND s3.likes IS NOT NULL ORDER BY s3.fetched_at DESC LIMIT 1)
-                ) AS likes,
-                COALESCE(
-                    s.comments,
-                    (SELECT s3.comments FROM snapshots s3 WHERE s3.post_id = p.id AND s3.comments IS NOT NULL ORDER BY s3.fetched_at DESC LIMIT 1)
-                ) AS comments,
-                COALESCE(
-                    s.views,
-                    (SELECT s3.views FROM snapshots s3 WHERE s3.post_id = p.id AND s3.views IS NOT NULL ORDER BY s3.fetched_at DESC LIMIT 1)
-                ) AS views,
-                s.source_status,
-                s.source_error,
-                s.fetched_at
-            FROM posts p
-            JOIN campaigns c ON c.id = p.campaign_id
-            JOIN creators cr ON cr.id = p.creator_id
-            LEFT JOIN snapshots s ON s.id = (
-                SELECT s2.id
-                FROM snapshots s2
-                WHERE s2.post_id = p.id
-                ORDER BY s2.fetched_at DESC
-                LIMIT 1
-            )
-            WHERE p.active = 1
-            ORDER BY c.name ASC, cr.handle ASC, p.id ASC
-            """
+async def dashboard(conn: Any = Depends(db_dep)) -> dict[str, Any]:
+    # One statement, so the latest-snapshot CTE is materialized once and both
+    # aggregates read from it. Rows are tagged by kind and share one column layout.
+    rows = db_fetchall_tuples(
+        conn,
+        f"""
+        WITH {latest_snapshot_cte("p.active = 1")}
+        SELECT
+            'post' AS kind,
+            c.id AS campaign_id,
+            c.name AS campaign_name,
+            cr.id AS creator_id,
+            cr.handle AS creator_handle,
+            cr.display_name AS creator_name,
+            NULL AS posts,
+            s.views,
+            s.likes,
+            s.comments,
+            s.post_id,
+            s.post_url,
+            s.last_polled_at,
+            cr.followers_text,
+            s.source_status,
+            s.source_error,
+            s.fetched_at,
+            c.name AS sort_name,
+            cr.handle AS sort_handle,
+            s.post_id AS sort_id
+        FROM latest s
+        JOIN campaigns c ON c.id = s.campaign_id
+        JOIN creators cr ON cr.id = s.creator_id
+        UNION ALL
+        SELECT
+            'creator',
+            NULL,
+            NULL,
+            cr.id,
+            cr.handle,
+            COALESCE(NULLIF(cr.display_name, ''), cr.handle),
+            {METRIC_SUMS_SQL},
+            NULL, NULL, NULL, NULL, NULL, NULL, NULL,
+            LOWER(cr.handle),
+            NULL,
+            cr.id
+        FROM latest s
+        JOIN creators cr ON cr.id = s.creator_id
+        GROUP BY cr.id, cr.handle, cr.display_name
+        UNION ALL
+        SELECT
+            'campaign',
+            c.id,
+            c.name,
+            NULL,
+            NULL,
+            NULL,
+            {METRIC_SUMS_SQL},
+            NULL, NULL, NULL, NULL, NULL, NULL, NULL,
+            LOWER(c.name),
+            NULL,
+            c.id
+        FROM latest s
+        JOIN campaigns c ON c.id = s.campaign_id
+        GROUP BY c.id, c.name
+        ORDER BY kind, sort_name, sort_handle, sort_id
+        """
+    )
+    rows_by_kind = {kind: list(group) for kind, group in groupby(rows, key=itemgetter(0))}
+
+    posts: list[dict[str, Any]] = [
+        {
+            "post_id": post_id,
+            "campaign_id": campaign_id,
+            "campaign_name": campaign_name,
+            "creator_id": creator_id,
+            "creator_handle": creator_handle,
+            "creator_name": creator_name or creator_handle,
+            "followers_text": followers_text or "-",
+            "post_url": post_url,
+            "views": views,
+            "likes": likes,
+            "comments": comments,
+            "source_status": source_status or "pending",
+            "source_error": source_error,
+            "last_snapshot_at": fetched_at,
+            "last_polled_at": last_polled_at,
+        }
+        for (
+            _,
+            campaign_id,
+            campaign_name,
+            creator_id,
+            creator_handle,
+            creator_name,
+            _,
+            views,
+            likes,
+            comments,
+            post_id,
+            post_url,
+            last_polled_at,
+            followers_text,
+            source_status,
+            source_error,
+            fetched_at,
+            *_,
+        ) in rows_by_kind.get("post", [])
+    ]
+    creators = [
+        {
+            "creator_id": creator_id,
+            "creator_handle": creator_handle,
+            "creator_name": creator_name,
+            "posts": post_count,
+            "views": views,
+            "likes": likes,
+            "comments": comments,
+        }
+        for (_, _, _, creator_id, creator_handle, creator_name, post_count, views, likes, comments, *_) in (
+            rows_by_kind.get("creator", [])
         )
-
-    posts: list[dict[str, Any]] = []
-    creator_agg: dict[str, dict[str, Any]] = {}
-    campaign_agg: dict[str, dict[str, Any]] = {}
-
-    totals = {"views": 0, "likes": 0, "comments": 0, "posts": 0}
-
-    for row in post_rows:
-        views_raw = coerce_int(row["views"])
-        likes_raw = coerce_int(row["likes"])
-        comments_raw = coerce_int(row["comments"])
-        views = int(views_raw or 0)
-        likes = int(likes_raw or 0)
-        comments = int(comments_raw or 0)
-
-        posts.append(
-            {
-                "post_id": row["post_id"],
-                "campaign_id": row["campaign_id"],
-                "campaign_name": row["campaign_name"],
-                "creator_id": row["creator_id"],
-                "creator_handle": row["creator_handle"],
-                "creator_name": row["creator_name"] or row["creator_handle"],
-                "followers_text": row["followers_text"] or "-",
-                "post_url": row["post_url"],
-                "views": views_raw,
-                "likes": likes_raw,
-                "comments": comments_raw,
-                "source_status": row["source_status"] or "pending",
-                "source_error": row["source_error"],
-                "last_snapshot_at": row["fetched_at"],
-                "last_polled_at": row["last_polled_at"],
-            }
+    ]
+    campaigns = [
+        {
+            "campaign_id": campaign_id,
+            "campaign_name": campaign_name,
+            "posts": post_count,
+            "views": views,
+            "likes": likes,
+            "comments": comments,
+        }
+        for (_, campaign_id, campaign_name, _, _, _, post_count, views, likes, comments, *_) in (
+            rows_by_kind.get("campaign", [])
         )
-
-        totals["views"] += views
-        totals["likes"] += likes
-        totals["comments"] += comments
-        totals["posts"] += 1
-
-        creator_key = row["creator_handle"]
-        if creator_key not in creator_agg:
-            creator_agg[creator_key] = {
-                "creator_id": row["creator_id"],
-                "creator_handle": creator_key,
-                "creator_name": row["creator_name"] or creator_key,
-                "posts": 0,
-                "views": 0,
-                "likes": 0,
-                "comments": 0,
-            }
-        creator_agg[creator_key]["posts"] += 1
-        creator_agg[creator_key]["views"] += views
-        creator_agg[creator_key]["likes"] += likes
-        creator_agg[creator_key]["comments"] += comments
-
-        campaign_key = row["campaign_name"]
-        if campaign_key not in campaign_agg:
-            campaign_agg[campaign_key] = {
-                "campaign_id": row["campaign_id"],
-                "campaign_name": campaign_key,
-                "posts": 0,
-                "views": 0,
-                "likes": 0,
-                "comments": 0,
-            }
-        campaign_agg[campaign_key]["posts"] += 1
-        campaign_agg[campaign_key]["views"] += views
-        campaign_agg[campaign_key]["likes"] += likes
-        campaign_agg[campaign_key]["comments"] += comments
-
+    ]
     return {
         "generated_at": utc_now_iso(),
-        "totals": totals,
-        "campaigns": sorted(campaign_agg.values(), key=lambda x: x["campaign_name"].lower()),
-        "creators": sorted(creator_agg.values(), key=lambda x: x["creator_handle"].lower()),
+        "totals": sum_metric_totals(campaigns),
+        "campaigns": campaigns,
+        "creators": creators,
         "posts": posts,
     }
 
 
 @app.get("/api/campaigns/{campaign_id}/dashboard")
-async def campaign_dashboard(campaign_id: int) -> dict[str, Any]:
-    with closing(get_db()) as conn:
-        campaign = db_fetchone(
-            conn,
-            "SELECT id, name FROM campaigns WHERE id = ?",
-            (campaign_id,),
-        )
-        if not campaign:
-            raise HTTPException(status_code=404, detail="Campaign not found")
-
-        post_rows = db_fetchall(
-            conn,
-            """
-            SELECT
-                p.id AS post_id,
-                p.post_url,
-                p.last_polled_at,
-                cr.id AS creator_id,
-                cr.handle AS creator_handle,
-                cr.display_name AS creator_name,
-                cr.followers_text AS followers_text,
-                COALESCE(
-                    s.likes,
-                    (SELECT s3.likes FROM snapshots s3 WHERE s3.post_id = p.id AND s3.likes IS NOT NULL ORDER BY s3.fetched_at DESC LIMIT 1)
-                ) AS likes,
-                COALESCE(
-                    s.comments,
-                    (SELECT s3.comments FROM snapshots s3 WHERE s3.post_id = p.id AND s3.comments IS NOT NULL ORDER BY s3.fetched_at DESC LIMIT 1)
-                ) AS comments,
-                COALESCE(
-                    s.views,
-                    (SELECT s3.views FROM snapshots s3 WHERE s3.post_id = p.id AND s3.views IS NOT NULL ORDER BY s3.fetched_at DESC LIMIT 1)
-                ) AS views,
-                s.source_status,
-                s.fetched_at
-            FROM posts p
-            JOIN creators cr ON cr.id = p.creator_id
-            LEFT JOIN snapshots s ON s.id = (
-                SELECT s2.id
-                FROM snapshots s2
-                WHERE s2.post_id = p.id
-                ORDER BY s2.fetched_at DESC
-                LIMIT 1
-            )
-            WHERE p.active = 1
-              AND p.campaign_id = ?
-            ORDER BY cr.handle ASC, p.id ASC
-            """,
-            (campaign_id,),
-        )
+async def campaign_dashboard(campaign_id: int, conn: Any = Depends(db_dep)) -> dict[str, Any]:
+    campaign = db_fetchone(
+        conn,
+        "SELECT id, name FROM campaigns WHERE id = ?",
+        (campaign_id,),
+    )
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
 
-    totals = {"views": 0, "likes": 0, "comments": 0, "posts": 0}
-    creators: dict[str, dict[str, Any]] = {}
-    posts: list[dict[str, Any]] = []
-
-    for row in post_rows:
-        views_raw = coerce_int(row["views"])
-        likes_raw = coerce_int(row["likes"])
-        comments_raw = coerce_int(row["comments"])
-        views = int(views_raw or 0)
-        likes = int(likes_raw or 0)
-        comments = int(comments_raw or 0)
-
-        posts.append(
-            {
-                "post_id": row["post_id"],
-                "creator_id": row["creator_id"],
-                "creator_handle": row["creator_handle"],
-                "creator_name": row["creator_name"] or row["creator_handle"],
-                "followers_text": row["followers_text"] or "-",
-                "post_url": row["post_url"],
-                "views": views_raw,
-                "likes": likes_raw,
-                "comments": comments_raw,
-                "source_status": row["source_status"] or "pending",
-                "last_snapshot_at": row["fetched_at"],
-            }
+    # Same single-statement shape as dashboard(), without the campaign rows.
+    rows = db_fetchall_tuples(
+        conn,
+        f"""
+        WITH {latest_snapshot_cte("p.active = 1 AND p.campaign_id = ?")}
+        SELECT
+            'post' AS kind,
+            cr.id AS creator_id,
+            cr.handle AS creator_handle,
+            cr.display_name AS creator_name,
+            NULL AS posts,
+            s.views,
+            s.likes,
+            s.comments,
+            s.post_id,
+            s.post_url,
+            cr.followers_text,
+            s.source_status,
+            s.fetched_at,
+            cr.handle AS sort_handle,
+            s.post_id AS sort_id
+        FROM latest s
+        JOIN creators cr ON cr.id = s.creator_id
+        UNION ALL
+        SELECT
+            'creator',
+            cr.id,
+            cr.handle,
+            COALESCE(NULLIF(cr.display_name, ''), cr.handle),
+            {METRIC_SUMS_SQL},
+            NULL, NULL, NULL, NULL, NULL,
+            LOWER(cr.handle),
+            cr.id
+        FROM latest s
+        JOIN creators cr ON cr.id = s.creator_id
+        GROUP BY cr.id, cr.handle, cr.display_name
+        ORDER BY kind, sort_handle, sort_id
+        """,
+        (campaign_id,),
+    )
+    rows_by_kind = {kind: list(group) for kind, group in groupby(rows, key=itemgetter(0))}
+
+    posts: list[dict[str, Any]] = [
+        {
+            "post_id": post_id,
+            "creator_id": creator_id,
+            "creator_handle": creator_handle,
+            "creator_name": creator_name or creator_handle,
+            "followers_text": followers_text or "-",
+            "post_url": post_url,
+            "views": views,
+            "likes": likes,
+            "comments": comments,
+            "source_status": source_status or "pending",
+            "last_snapshot_at": fetched_at,
+        }
+        for (
+            _,
+            creator_id,
+            creator_handle,
+            creator_name,
+            _,
+            views,
+            likes,
+            comments,
+            post_id,
+            post_url,
+            followers_text,
+            source_status,
+            fetched_at,
+            *_,
+        ) in rows_by_kind.get("post", [])
+    ]
+    creators = [
+        {
+            "creator_id": creator_id,
+            "creator_handle": creator_handle,
+            "creator_name": creator_name,
+            "posts": post_count,
+            "views": views,
+            "likes": likes,
+            "comments": comments,
+        }
+        for (_, creator_id, creator_handle, creator_name, post_count, views, likes, comments, *_) in (
+            rows_by_kind.get("creator", [])
         )
-
-        totals["views"] += views
-        totals["likes"] += likes
-        totals["comments"] += comments
-        totals["posts"] += 1
-
-        key = row["creator_handle"]
-        if key not in creators:
-            creators[key] = {
-                "creator_id": row["creator_id"],
-                "creator_handle": row["creator_handle"],
-                "creator_name": row["creator_name"] or row["creator_handle"],
-                "posts": 0,
-                "views": 0,
-                "likes": 0,
-                "comments": 0,
-            }
-        creators[key]["posts"] += 1
-        creators[key]["views"] += views
-        creators[key]["likes"] += likes
-        creators[key]["comments"] += comments
-
+    ]
     return {
         "generated_at": utc_now_iso(),
         "campaign": {"campaign_id": campaign["id"], "campaign_name": campaign["name"]},
-        "totals": totals,
-        "creators": sorted(creators.values(), key=lambda x: x["creator_handle"].lower()),
+        "totals": sum_metric_totals(creators),
+        "creators": creators,
         "posts": posts,
     }
@@ -19,7 +19,8 @@ def main() -> int:
 
     url = f"{base_url}/api/cron/daily"
     try:
-        response = httpx.post(url, headers={"X-Cron-Secret": secret}, timeout=120)
+        with httpx.Client(headers={"X-Cron-Secret": secret}, timeout=120, http2=True) as client:
+            response = client.post(url)
         print(response.status_code, response.text)
         return 0 if response.status_code < 300 else 1
     except Exception as exc:  # noqa: BLE001